@@ -0,0 +1,274 @@
+"""
+Face detector backends.
+
+Every detector exposes detect_faces(image_rgb) with the same contract as
+mtcnn.MTCNN: a list of dicts with at least 'box' ([x, y, w, h]) and
+'confidence'. The detector is chosen once at startup:
+
+- FACE_DETECTOR: mtcnn (default), haar, yunet or cascade
+- CASCADE_PROPOSER: haar (default) or yunet, the cheap first stage in cascade mode
+- YUNET_MODEL_PATH: face_detection_yunet ONNX model, needed for yunet
+
+In cascade mode the cheap detector runs on the whole frame. Frames with no
+proposals are rejected outright, and MTCNN only refines the padded regions
+around each proposal instead of building its image pyramid over the full
+frame.
+
+Comparing recall and speed on the same clips (MTCNN on the full frame is
+the reference):
+    python detectors.py benchmark clip1.mp4 [clip2.mp4 ...] [--max-frames N]
+"""
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+FACE_DETECTOR = os.environ.get("FACE_DETECTOR", "mtcnn").lower().strip()
+CASCADE_PROPOSER = os.environ.get("CASCADE_PROPOSER", "haar").lower().strip()
+YUNET_MODEL_PATH = os.environ.get("YUNET_MODEL_PATH", "")
+
+# Proposal boxes are grown by this fraction of their size on every side before
+# MTCNN refines them, since cheap detectors often clip the chin or forehead.
+CASCADE_MARGIN = 0.5
+
+# Refined faces overlapping more than this are treated as the same face
+NMS_IOU = 0.4
+
+# Sampled frames per benchmark run, so long clips do not dominate the runtime
+BENCHMARK_MAX_FRAMES = 300
+
+
+# Set by load_face_detector
+_loaded_name = None
+
+
+def detector_profile():
+    """Name of the loaded detector (e.g. "cascade-haar"), or of FACE_DETECTOR until one loads."""
+    if _loaded_name:
+        return _loaded_name
+    if FACE_DETECTOR == "cascade":
+        return f"cascade-{CASCADE_PROPOSER}"
+    return FACE_DETECTOR
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+class MTCNNDetector:
+    name = "mtcnn"
+
+    def __init__(self):
+        from inference import load_detector
+        self.detector = load_detector()
+
+    def detect_faces(self, image_rgb):
+        return self.detector.detect_faces(image_rgb)
+
+
+class HaarDetector:
+    name = "haar"
+
+    def __init__(self, scale_factor=1.1, min_neighbors=5, min_size=(24, 24)):
+        path = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+        self.cascade = cv2.CascadeClassifier(path)
+        if self.cascade.empty():
+            raise FileNotFoundError(f"Haar cascade not found at {path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect_faces(self, image_rgb):
+        gray = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2GRAY)
+        boxes = self.cascade.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors, minSize=self.min_size
+        )
+        # Haar has no calibrated score, so every detection is reported at 1.0
+        return [{"box": [int(v) for v in box], "confidence": 1.0} for box in boxes]
+
+
+class YuNetDetector:
+    name = "yunet"
+
+    def __init__(self, model_path, score_threshold=0.7):
+        if not model_path or not os.path.exists(model_path):
+            raise FileNotFoundError(f"YUNET_MODEL_PATH '{model_path}' not found")
+        self.detector = cv2.FaceDetectorYN.create(model_path, "", (320, 320), score_threshold)
+        self.input_size = None
+
+    def detect_faces(self, image_rgb):
+        h, w = image_rgb.shape[:2]
+        if self.input_size != (w, h):
+            self.detector.setInputSize((w, h))
+            self.input_size = (w, h)
+        _, faces = self.detector.detect(cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR))
+        if faces is None:
+            return []
+        return [
+            {"box": [int(v) for v in face[:4]], "confidence": float(face[-1])}
+            for face in faces
+        ]
+
+
+class CascadedDetector:
+    """Cheap detector proposes face regions; MTCNN refines only those regions."""
+
+    def __init__(self, proposer, refiner, margin=CASCADE_MARGIN):
+        self.proposer = proposer
+        self.refiner = refiner
+        self.margin = margin
+        self.name = f"cascade-{proposer.name}"
+
+    def detect_faces(self, image_rgb):
+        proposals = self.proposer.detect_faces(image_rgb)
+        if not proposals:
+            return []
+
+        img_h, img_w = image_rgb.shape[:2]
+        faces = []
+        for proposal in proposals:
+            x, y, w, h = proposal["box"]
+            pad_x, pad_y = int(w * self.margin), int(h * self.margin)
+            x1, y1 = max(0, x - pad_x), max(0, y - pad_y)
+            x2, y2 = min(img_w, x + w + pad_x), min(img_h, y + h + pad_y)
+            region = image_rgb[y1:y2, x1:x2]
+            if region.size == 0: continue
+
+            for face in self.refiner.detect_faces(region):
+                fx, fy, fw, fh = face["box"]
+                face["box"] = [fx + x1, fy + y1, fw, fh]
+                if "keypoints" in face:
+                    face["keypoints"] = {k: (px + x1, py + y1) for k, (px, py) in face["keypoints"].items()}
+                faces.append(face)
+
+        # Padded regions of neighbouring proposals can refine to the same face
+        faces.sort(key=lambda f: f["confidence"], reverse=True)
+        kept = []
+        for face in faces:
+            if all(iou(face["box"], k["box"]) < NMS_IOU for k in kept):
+                kept.append(face)
+        return kept
+
+
+def _build(name):
+    if name == "mtcnn":
+        return MTCNNDetector()
+    if name == "haar":
+        return HaarDetector()
+    if name == "yunet":
+        return YuNetDetector(YUNET_MODEL_PATH)
+    if name == "cascade":
+        return CascadedDetector(_build(CASCADE_PROPOSER), MTCNNDetector())
+    raise ValueError(f"Unknown detector '{name}'. Use mtcnn, haar, yunet or cascade.")
+
+
+def load_face_detector():
+    """Create the configured detector, falling back to MTCNN if it fails to load."""
+    global _loaded_name
+    detector = None
+    if FACE_DETECTOR != "mtcnn":
+        try:
+            detector = _build(FACE_DETECTOR)
+            print(f"✅ Face detector: {detector.name}")
+        except Exception as e:
+            print(f"⚠️ Warning: Could not load '{FACE_DETECTOR}' detector ({e}). Falling back to MTCNN.")
+    if detector is None:
+        detector = MTCNNDetector()
+    _loaded_name = detector.name
+    return detector
+
+
+# --- BENCHMARK ---
+def _sample_frames(video_path):
+    """Yield one RGB frame per second, matching the sampling used by the search."""
+    cap = cv2.VideoCapture(video_path)
+    fps = int(cap.get(cv2.CAP_PROP_FPS)) or 1
+    frame_count = 0
+    while True:
+        success, frame = cap.read()
+        if not success: break
+        if frame_count % fps == 0:
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        frame_count += 1
+    cap.release()
+
+
+def _bounded_frames(video_paths, max_frames):
+    """Stream at most max_frames sampled frames across the clips, in order."""
+    yielded = 0
+    for path in video_paths:
+        for frame in _sample_frames(path):
+            if yielded >= max_frames:
+                return
+            yield frame
+            yielded += 1
+
+
+def benchmark(video_paths, backends=("mtcnn", "haar", "yunet", "cascade"), match_iou=0.3,
+              max_frames=BENCHMARK_MAX_FRAMES):
+    """
+    Run each detector over the same first max_frames sampled frames.
+
+    Frames are decoded again for every backend instead of being held in
+    memory, and only detection time is counted. Recall is the fraction of
+    faces found by full-frame MTCNN that the backend also finds
+    (IoU >= match_iou). Returns one dict per backend.
+    """
+    results = []
+    reference = None
+    for name in backends:
+        try:
+            detector = _build(name)
+        except Exception as e:
+            print(f"⚠️ Skipping {name}: {e}")
+            continue
+
+        detections = []
+        elapsed = 0.0
+        for frame in _bounded_frames(video_paths, max_frames):
+            start = time.perf_counter()
+            faces = detector.detect_faces(frame)
+            elapsed += time.perf_counter() - start
+            detections.append([f["box"] for f in faces])
+        if not detections:
+            raise ValueError("No frames could be read from the given clips")
+
+        if name == "mtcnn":
+            reference = detections
+        row = {"backend": detector.name, "frames": len(detections), "fps": len(detections) / elapsed if elapsed else 0.0,
+               "faces": sum(len(d) for d in detections), "recall": None}
+        if reference is not None:
+            expected = sum(len(r) for r in reference)
+            found = sum(
+                any(iou(ref_box, box) >= match_iou for box in boxes)
+                for ref_boxes, boxes in zip(reference, detections)
+                for ref_box in ref_boxes
+            )
+            row["recall"] = found / expected if expected else 1.0
+        results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) >= 2 and args[0] == "benchmark":
+        max_frames = BENCHMARK_MAX_FRAMES
+        if "--max-frames" in args:
+            i = args.index("--max-frames")
+            max_frames = int(args[i + 1])
+            args = args[:i] + args[i + 2:]
+        print(f"📊 Detector benchmark on {len(args) - 1} clip(s), up to {max_frames} sampled frames")
+        for row in benchmark(args[1:], max_frames=max_frames):
+            recall = f"{row['recall']*100:5.1f}%" if row["recall"] is not None else "  n/a"
+            print(f"{row['backend']:>14} | {row['fps']:7.2f} frames/s | {row['faces']:5d} faces | recall {recall}")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,237 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+EMBEDDING_DIM = 512
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+# Rows scored per step when scanning, so only a small float32 working set is
+# materialised regardless of how large the memory-mapped archive grows.
+SCAN_CHUNK_ROWS = 4096
+
+
+def _normalise(embeddings):
+    """L2-normalise rows so cosine similarity becomes a plain dot product."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def quantise(embeddings, dtype):
+    """
+    Quantise normalised float32 embeddings.
+
+    Returns (data, scales). scales is None except for int8, which uses
+    symmetric per-row scaling: value ~= data * scale.
+    """
+    if dtype == "float32":
+        return embeddings.astype(np.float32), None
+    if dtype == "float16":
+        return embeddings.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(embeddings).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        data = np.clip(np.rint(embeddings / scales[:, None]), -127, 127).astype(np.int8)
+        return data, scales.astype(np.float32)
+    raise ValueError(f"Unsupported dtype '{dtype}'. Use one of {SUPPORTED_DTYPES}")
+
+
+def cosine_scores(data, scales, query, chunk_rows=SCAN_CHUNK_ROWS):
+    """Cosine similarity of a normalised query against every stored row."""
+    query = _normalise(np.asarray(query).reshape(1, -1))[0]
+    scores = np.empty(len(data), dtype=np.float32)
+    for start in range(0, len(data), chunk_rows):
+        end = min(start + chunk_rows, len(data))
+        scores[start:end] = data[start:end].astype(np.float32) @ query
+        if scales is not None:
+            scores[start:end] *= scales[start:end]
+    return scores
+
+
+class EmbeddingStore:
+    """
+    Columnar on-disk face embedding store, one directory per video.
+
+    Each video directory holds contiguous .npy arrays that are opened with
+    mmap_mode='r', so scans read straight from the page cache instead of
+    holding every embedding in Python objects:
+    - embeddings.npy: (N, 512) float32 / float16 / int8
+    - scales.npy: (N,) float32 per-row scales (int8 only)
+    - frames.npy: (N,) int64 frame index
+    - timestamps.npy: (N,) float32 seconds into the video
+    - boxes.npy: (N, 4) int32 face box as x, y, w, h
+    """
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _video_dir(self, video_id):
+        return os.path.join(self.root_dir, video_id)
+
+    def exists(self, video_id):
+        return os.path.exists(os.path.join(self._video_dir(video_id), "meta.json"))
+
+    def write(self, video_id, embeddings, frames, timestamps, boxes, dtype="float32"):
+        """Write (or overwrite) the embedding columns for one video."""
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        data, scales = quantise(_normalise(embeddings), dtype)
+
+        video_dir = self._video_dir(video_id)
+        # Unique per writer, so concurrent indexing of the same video cannot clobber each other
+        tmp_dir = tempfile.mkdtemp(prefix=f"{video_id}.", suffix=".tmp", dir=self.root_dir)
+
+        np.save(os.path.join(tmp_dir, "embeddings.npy"), data)
+        if scales is not None:
+            np.save(os.path.join(tmp_dir, "scales.npy"), scales)
+        np.save(os.path.join(tmp_dir, "frames.npy"), np.asarray(frames, dtype=np.int64))
+        np.save(os.path.join(tmp_dir, "timestamps.npy"), np.asarray(timestamps, dtype=np.float32))
+        np.save(os.path.join(tmp_dir, "boxes.npy"), np.asarray(boxes, dtype=np.int32).reshape(-1, 4))
+
+        meta = {
+            "video_id": video_id,
+            "count": int(len(data)),
+            "dim": EMBEDDING_DIM,
+            "dtype": dtype,
+            "bytes": int(data.nbytes + (scales.nbytes if scales is not None else 0)),
+        }
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        # Swap the finished directory in so readers never see a half-written store
+        try:
+            shutil.rmtree(video_dir, ignore_errors=True)
+            os.replace(tmp_dir, video_dir)
+        except OSError:
+            # Another writer swapped its directory in first; keep theirs
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return meta
+
+    def meta(self, video_id):
+        """Read only the metadata (count, dtype, bytes) for one video, without mapping any arrays."""
+        with open(os.path.join(self._video_dir(video_id), "meta.json")) as f:
+            return json.load(f)
+
+    def open(self, video_id):
+        """Memory-map the columns for one video. Returns a dict of arrays plus 'meta'."""
+        video_dir = self._video_dir(video_id)
+        columns = {"meta": self.meta(video_id)}
+        for name in ("embeddings", "frames", "timestamps", "boxes"):
+            columns[name] = np.load(os.path.join(video_dir, f"{name}.npy"), mmap_mode="r")
+        scales_path = os.path.join(video_dir, "scales.npy")
+        columns["scales"] = np.load(scales_path, mmap_mode="r") if os.path.exists(scales_path) else None
+        return columns
+
+    def search(self, video_id, query_embedding, top_k=5, min_score=None):
+        """
+        Score a query embedding against every face stored for a video.
+
+        Returns up to top_k hits, best first, as dicts with score, frame,
+        timestamp and box.
+        """
+        columns = self.open(video_id)
+        if columns["meta"]["count"] == 0:
+            return []
+
+        scores = cosine_scores(columns["embeddings"], columns["scales"], query_embedding)
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+
+        hits = []
+        for i in best:
+            if min_score is not None and scores[i] < min_score:
+                break
+            hits.append({
+                "score": float(scores[i]),
+                "frame": int(columns["frames"][i]),
+                "timestamp": float(columns["timestamps"][i]),
+                "box": [int(v) for v in columns["boxes"][i]],
+            })
+        return hits
+
+    def delete(self, video_id):
+        shutil.rmtree(self._video_dir(video_id), ignore_errors=True)
+
+    def stats(self):
+        videos = 0
+        total_bytes = 0
+        for video_id in os.listdir(self.root_dir):
+            if not video_id.endswith(".tmp") and self.exists(video_id):
+                total_bytes += self.meta(video_id)["bytes"]
+                videos += 1
+        return {"videos": videos, "embedding_bytes": total_bytes}
+
+
+# --- ACCURACY VS FOOTPRINT REPORT ---
+def quantisation_report(embeddings, queries, top_k=5):
+    """
+    Measure how far quantised cosine scores drift from full precision.
+
+    For each dtype, reports bytes per embedding, max/mean absolute score
+    error against float32, and how often the top-1 and top-k hits agree.
+    """
+    reference = _normalise(embeddings)
+    queries = _normalise(queries)
+    exact = queries @ reference.T
+    top_k = min(top_k, reference.shape[0])
+    exact_top = np.argsort(-exact, axis=1)[:, :top_k]
+
+    report = []
+    for dtype in SUPPORTED_DTYPES:
+        data, scales = quantise(reference, dtype)
+        approx = np.stack([cosine_scores(data, scales, q) for q in queries])
+        approx_top = np.argsort(-approx, axis=1)[:, :top_k]
+        error = np.abs(approx - exact)
+        overlap = np.mean([
+            len(set(a) & set(b)) / top_k for a, b in zip(approx_top, exact_top)
+        ])
+        footprint = data.nbytes + (scales.nbytes if scales is not None else 0)
+        report.append({
+            "dtype": dtype,
+            "bytes_per_embedding": footprint / len(data),
+            "footprint_ratio": footprint / (reference.nbytes),
+            "max_abs_error": float(error.max()),
+            "mean_abs_error": float(error.mean()),
+            "top1_agreement": float(np.mean(approx_top[:, 0] == exact_top[:, 0])),
+            f"top{top_k}_overlap": float(overlap),
+        })
+    return report
+
+
+def print_report(report):
+    for row in report:
+        print(
+            f"{row['dtype']:>8} | {row['bytes_per_embedding']:7.1f} B/emb "
+            f"({row['footprint_ratio']*100:5.1f}%) | "
+            f"max err {row['max_abs_error']:.5f} | mean err {row['mean_abs_error']:.5f} | "
+            f"top-1 {row['top1_agreement']*100:5.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    # Usage:
+    #   python embedding_store.py <store_dir> <video_id>   (video must be stored as float32)
+    #   python embedding_store.py                          (synthetic data)
+    if len(sys.argv) == 3:
+        columns = EmbeddingStore(sys.argv[1]).open(sys.argv[2])
+        if columns["meta"]["dtype"] != "float32":
+            sys.exit("❌ Report needs a full-precision (float32) store as reference.")
+        embeddings = np.asarray(columns["embeddings"])
+        print(f"📊 Quantisation report for {sys.argv[2]} ({len(embeddings)} faces)")
+    else:
+        # Synthetic clusters stand in for "same person across frames"
+        rng = np.random.default_rng(0)
+        centres = rng.normal(size=(200, EMBEDDING_DIM))
+        embeddings = np.repeat(centres, 25, axis=0) + 0.3 * rng.normal(size=(5000, EMBEDDING_DIM))
+        print(f"📊 Quantisation report on synthetic data ({len(embeddings)} faces)")
+
+    rng = np.random.default_rng(1)
+    query_rows = rng.choice(len(embeddings), size=min(100, len(embeddings)), replace=False)
+    queries = embeddings[query_rows] + 0.1 * rng.normal(size=(len(query_rows), EMBEDDING_DIM))
+    print_report(quantisation_report(embeddings, queries))
@@ -0,0 +1,379 @@
+"""
+Pluggable CPU inference backends for FaceNet and MTCNN.
+
+The backend is chosen once at startup from environment variables, so a
+deployment can switch to an exported model (or back to Keras) without code
+changes:
+
+- FACENET_BACKEND: keras (default), tflite or onnx
+- FACENET_MODEL_PATH: exported model file for tflite / onnx
+- INFERENCE_INTRA_OP_THREADS / INFERENCE_INTER_OP_THREADS: 0 = library default
+- INFERENCE_ONEDNN: 1 (default) enables TensorFlow's oneDNN kernels, 0 disables
+- MTCNN_COMPILE: 1 (default) runs the MTCNN stages as compiled tf.function graphs
+
+If the requested backend cannot be loaded, Keras is used instead.
+
+Exporting and checking parity against Keras:
+    python inference.py export tflite facenet.tflite [--int8] [--calib photos_dir]
+    python inference.py export onnx facenet.onnx [--int8]
+    python inference.py parity photos_dir
+    python inference.py parity-detector photos_dir   (compiled vs eager MTCNN)
+"""
+import os
+import sys
+
+import numpy as np
+
+FACENET_INPUT_SIZE = 160
+
+BACKEND = os.environ.get("FACENET_BACKEND", "keras").lower().strip()
+MODEL_PATH = os.environ.get("FACENET_MODEL_PATH", "")
+INTRA_OP_THREADS = int(os.environ.get("INFERENCE_INTRA_OP_THREADS", "0"))
+INTER_OP_THREADS = int(os.environ.get("INFERENCE_INTER_OP_THREADS", "0"))
+ONEDNN = os.environ.get("INFERENCE_ONEDNN", "1")
+MTCNN_COMPILE = os.environ.get("MTCNN_COMPILE", "1") == "1"
+
+# Minimum cosine similarity between a backend's embedding and the Keras one
+# for the same face before parity is considered broken.
+PARITY_MIN_COSINE = 0.99
+
+# Largest box coordinate (pixels) / confidence drift allowed between compiled
+# and eager MTCNN on the same photo.
+PARITY_MAX_BOX_PX = 2
+PARITY_MAX_CONFIDENCE = 0.01
+
+# Backends chosen by load_embedder / load_detector, after any fallback
+_loaded = {"facenet": None, "mtcnn": None}
+
+
+def backend_profile():
+    """"<facenet>[:<model file>]/mtcnn-<mode>", e.g. "tflite:facenet.tflite/mtcnn-compiled"."""
+    name = _loaded["facenet"] or BACKEND
+    if name != "keras":
+        name += f":{os.path.basename(MODEL_PATH)}"
+    mtcnn = _loaded["mtcnn"] or ("compiled" if MTCNN_COMPILE else "eager")
+    return f"{name}/mtcnn-{mtcnn}"
+
+
+def configure_tensorflow():
+    """Apply thread and oneDNN settings. Must run before TensorFlow creates its first op."""
+    os.environ.setdefault("TF_ENABLE_ONEDNN_OPTS", ONEDNN)
+    import tensorflow as tf
+    if INTRA_OP_THREADS:
+        tf.config.threading.set_intra_op_parallelism_threads(INTRA_OP_THREADS)
+    if INTER_OP_THREADS:
+        tf.config.threading.set_inter_op_parallelism_threads(INTER_OP_THREADS)
+    return tf
+
+
+def prewhiten(image):
+    """FaceNet per-image standardisation (matches keras_facenet's preprocessing)."""
+    image = np.asarray(image, dtype=np.float32)
+    mean = image.mean()
+    std = max(image.std(), 1.0 / np.sqrt(image.size))
+    # std falls back to a Python float for flat crops, which would promote to float64
+    return ((image - mean) / std).astype(np.float32)
+
+
+# --- FACENET BACKENDS ---
+# Every backend exposes embeddings(images) with the same contract as
+# keras_facenet.FaceNet: uint8 RGB faces of shape (N, 160, 160, 3) in,
+# (N, 512) float32 embeddings out.
+
+class KerasFaceNet:
+    name = "keras"
+
+    def __init__(self):
+        from keras_facenet import FaceNet
+        self.model = FaceNet()
+
+    def embeddings(self, images):
+        return self.model.embeddings(images)
+
+
+class TFLiteFaceNet:
+    name = "tflite"
+
+    def __init__(self, model_path):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=model_path, num_threads=INTRA_OP_THREADS or None)
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.batch_size = None
+
+    def embeddings(self, images):
+        batch = np.stack([prewhiten(image) for image in images])
+        if self.batch_size != len(batch):
+            self.interpreter.resize_tensor_input(self.input["index"], batch.shape)
+            self.interpreter.allocate_tensors()
+            self.batch_size = len(batch)
+
+        # Fully int8-quantised models take quantised inputs and return quantised outputs
+        if self.input["dtype"] in (np.int8, np.uint8):
+            scale, zero_point = self.input["quantization"]
+            batch = np.clip(np.rint(batch / scale + zero_point), np.iinfo(self.input["dtype"]).min, np.iinfo(self.input["dtype"]).max)
+        self.interpreter.set_tensor(self.input["index"], batch.astype(self.input["dtype"]))
+        self.interpreter.invoke()
+        out = self.interpreter.get_tensor(self.output["index"])
+        if self.output["dtype"] in (np.int8, np.uint8):
+            scale, zero_point = self.output["quantization"]
+            out = (out.astype(np.float32) - zero_point) * scale
+        return out.astype(np.float32)
+
+
+class OnnxFaceNet:
+    name = "onnx"
+
+    def __init__(self, model_path):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = INTRA_OP_THREADS
+        options.inter_op_num_threads = INTER_OP_THREADS
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def embeddings(self, images):
+        batch = np.stack([prewhiten(image) for image in images])
+        return self.session.run(None, {self.input_name: batch})[0].astype(np.float32)
+
+
+def load_embedder():
+    """Create the configured FaceNet backend, falling back to Keras if it fails to load."""
+    if BACKEND in ("tflite", "onnx"):
+        try:
+            if not MODEL_PATH or not os.path.exists(MODEL_PATH):
+                raise FileNotFoundError(f"FACENET_MODEL_PATH '{MODEL_PATH}' not found")
+            embedder = TFLiteFaceNet(MODEL_PATH) if BACKEND == "tflite" else OnnxFaceNet(MODEL_PATH)
+            print(f"✅ FaceNet backend: {BACKEND} ({MODEL_PATH})")
+        except Exception as e:
+            print(f"⚠️ Warning: Could not load {BACKEND} FaceNet backend ({e}). Falling back to Keras.")
+            embedder = KerasFaceNet()
+    else:
+        if BACKEND != "keras":
+            print(f"⚠️ Warning: Unknown FACENET_BACKEND '{BACKEND}'. Falling back to Keras.")
+        embedder = KerasFaceNet()
+    _loaded["facenet"] = embedder.name
+    return embedder
+
+
+# --- MTCNN ---
+def compile_mtcnn(detector):
+    """
+    Replace the per-call Keras predict() of MTCNN's P/R/O-Nets with compiled
+    tf.function graphs. predict() rebuilds its execution loop on every call,
+    which dominates the cost of the many tiny batches MTCNN issues per frame.
+
+    Returns the number of stages compiled; 0 means this mtcnn release has
+    different internals and the detector is still running eagerly.
+    """
+    import tensorflow as tf
+
+    def compiled_predict(model):
+        graph = tf.function(model, input_signature=[tf.TensorSpec([None, None, None, 3], tf.float32)])
+
+        def predict(x, *args, **kwargs):
+            out = graph(tf.convert_to_tensor(x, dtype=tf.float32))
+            if isinstance(out, (list, tuple)):
+                return [o.numpy() for o in out]
+            return out.numpy()
+        return predict
+
+    compiled = 0
+    for attr in ("_pnet", "_rnet", "_onet"):
+        model = getattr(detector, attr, None)
+        if model is not None and hasattr(model, "predict"):
+            model.predict = compiled_predict(model)
+            compiled += 1
+    if compiled:
+        print(f"✅ MTCNN: {compiled} stages compiled")
+    return compiled
+
+
+def load_detector():
+    from mtcnn import MTCNN
+    detector = MTCNN()
+    _loaded["mtcnn"] = "eager"
+    if MTCNN_COMPILE:
+        try:
+            stages = compile_mtcnn(detector)
+            if stages == 3:
+                _loaded["mtcnn"] = "compiled"
+            elif stages:
+                _loaded["mtcnn"] = f"compiled-{stages}of3"
+            else:
+                print("⚠️ Warning: MTCNN stages not found, nothing compiled. Using eager Keras.")
+        except Exception as e:
+            print(f"⚠️ Warning: Could not compile MTCNN ({e}). Using eager Keras.")
+    return detector
+
+
+# --- EXPORT ---
+def _calibration_faces(photos_dir, limit=200):
+    """Crop faces from a directory of photos for int8 calibration / parity checks."""
+    import cv2
+    from mtcnn import MTCNN
+    detector = MTCNN()
+    faces = []
+    for filename in sorted(os.listdir(photos_dir)):
+        img = cv2.imread(os.path.join(photos_dir, filename))
+        if img is None: continue
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        results = detector.detect_faces(img)
+        if not results: continue
+        x, y, w, h = results[0]['box']
+        x, y = max(0, x), max(0, y)
+        faces.append(cv2.resize(img[y:y+h, x:x+w], (FACENET_INPUT_SIZE, FACENET_INPUT_SIZE)))
+        if len(faces) >= limit: break
+    return np.array(faces, dtype=np.uint8)
+
+
+def export_facenet(fmt, output_path, int8=False, calibration_dir=None):
+    """
+    Export the Keras FaceNet model to TFLite or ONNX.
+
+    int8 uses full integer quantisation for TFLite when calibration photos
+    are given (dynamic-range otherwise), and dynamic int8 weight
+    quantisation for ONNX.
+    """
+    tf = configure_tensorflow()
+    from keras_facenet import FaceNet
+    model = FaceNet().model
+
+    if fmt == "tflite":
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        if int8:
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            if calibration_dir:
+                faces = _calibration_faces(calibration_dir)
+
+                def representative_dataset():
+                    for face in faces:
+                        yield [prewhiten(face)[None, ...]]
+                converter.representative_dataset = representative_dataset
+                converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+                converter.inference_input_type = tf.int8
+                converter.inference_output_type = tf.int8
+        with open(output_path, "wb") as f:
+            f.write(converter.convert())
+    elif fmt == "onnx":
+        import tf2onnx
+        spec = (tf.TensorSpec([None, FACENET_INPUT_SIZE, FACENET_INPUT_SIZE, 3], tf.float32, name="input"),)
+        tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=output_path)
+        if int8:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(output_path, output_path, weight_type=QuantType.QInt8)
+    else:
+        raise ValueError(f"Unsupported export format '{fmt}'. Use tflite or onnx.")
+
+    print(f"✅ Exported FaceNet to {output_path} ({os.path.getsize(output_path) / 1e6:.1f} MB)")
+
+
+# --- PARITY CHECK ---
+def parity_check(photos_dir, embedder=None):
+    """
+    Compare the configured backend's embeddings against Keras on real faces.
+
+    Returns a dict with min/mean cosine similarity and whether it meets
+    PARITY_MIN_COSINE.
+    """
+    configure_tensorflow()
+    faces = _calibration_faces(photos_dir)
+    if len(faces) == 0:
+        raise ValueError(f"No faces found in {photos_dir}")
+
+    reference = KerasFaceNet().embeddings(faces)
+    candidate = (embedder or load_embedder()).embeddings(faces)
+
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = np.sum(reference * candidate, axis=1)
+
+    return {
+        "backend": backend_profile(),
+        "faces": int(len(faces)),
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "passed": bool(cosines.min() >= PARITY_MIN_COSINE),
+    }
+
+
+def detector_parity_check(photos_dir, limit=200):
+    """
+    Compare compiled MTCNN (compile_mtcnn) against eager MTCNN on the same photos.
+
+    Faces are paired greedily by box overlap. Returns a dict with the number
+    of photos whose face count differs, the largest box coordinate and
+    confidence differences, and whether they are within tolerance.
+    """
+    import cv2
+    configure_tensorflow()
+    from mtcnn import MTCNN
+    eager = MTCNN()
+    compiled = MTCNN()
+    if not compile_mtcnn(compiled):
+        raise RuntimeError("No MTCNN stages could be compiled; nothing to compare")
+
+    photos = count_mismatches = 0
+    max_box_diff = max_confidence_diff = 0.0
+    for filename in sorted(os.listdir(photos_dir))[:limit]:
+        img = cv2.imread(os.path.join(photos_dir, filename))
+        if img is None: continue
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        photos += 1
+
+        reference = eager.detect_faces(img)
+        candidate = compiled.detect_faces(img)
+        if len(reference) != len(candidate):
+            count_mismatches += 1
+
+        remaining = list(candidate)
+        for ref in reference:
+            if not remaining: break
+            best = min(remaining, key=lambda c: np.abs(np.subtract(c["box"], ref["box"])).max())
+            remaining.remove(best)
+            max_box_diff = max(max_box_diff, float(np.abs(np.subtract(best["box"], ref["box"])).max()))
+            max_confidence_diff = max(max_confidence_diff, abs(best["confidence"] - ref["confidence"]))
+
+    if photos == 0:
+        raise ValueError(f"No images found in {photos_dir}")
+
+    return {
+        "photos": photos,
+        "count_mismatches": count_mismatches,
+        "max_box_diff_px": max_box_diff,
+        "max_confidence_diff": max_confidence_diff,
+        "passed": bool(
+            count_mismatches == 0
+            and max_box_diff <= PARITY_MAX_BOX_PX
+            and max_confidence_diff <= PARITY_MAX_CONFIDENCE
+        ),
+    }
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) >= 3 and args[0] == "export":
+        calibration_dir = args[args.index("--calib") + 1] if "--calib" in args else None
+        export_facenet(args[1], args[2], int8="--int8" in args, calibration_dir=calibration_dir)
+    elif len(args) == 2 and args[0] == "parity":
+        result = parity_check(args[1])
+        print(f"📊 Parity {result['backend']} vs keras on {result['faces']} faces: "
+              f"min cosine {result['min_cosine']:.4f} | mean {result['mean_cosine']:.4f}")
+        print("✅ Parity OK" if result["passed"] else f"❌ Parity below {PARITY_MIN_COSINE}")
+        sys.exit(0 if result["passed"] else 1)
+    elif len(args) == 2 and args[0] == "parity-detector":
+        result = detector_parity_check(args[1])
+        print(f"📊 Parity compiled vs eager MTCNN on {result['photos']} photos: "
+              f"{result['count_mismatches']} face-count mismatches | "
+              f"max box diff {result['max_box_diff_px']:.1f}px | "
+              f"max confidence diff {result['max_confidence_diff']:.4f}")
+        print("✅ Parity OK" if result["passed"] else "❌ Compiled MTCNN differs from eager MTCNN")
+        sys.exit(0 if result["passed"] else 1)
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -8,8 +8,14 @@ from pathlib import Path
 import tempfile
 import os
 from typing import List, Dict
-import shutil
+import asyncio
+import threading
 from datetime import datetime
+from inference import backend_profile
+from detectors import detector_profile
+from embedding_store import EmbeddingStore, SUPPORTED_DTYPES
+from scheduler import SearchScheduler, SchedulerOverloaded, rank_videos
+from search_cache import SearchResultCache, copy_and_hash, make_key, NO_MATCH, SCAN_PROFILE_VERSION
 
 app = FastAPI()
 
@@ -29,6 +35,27 @@ search_results: Dict[str, dict] = {}
 
 UPLOAD_DIR = "uploaded_videos"
 PHOTOS_DIR = "missing_persons_photos"
+EMBEDDINGS_DIR = "video_embeddings"
+SEARCH_CACHE_SIZE = 128
+MAX_CONCURRENT_SEARCHES = 2
+MAX_QUEUED_SEARCHES = 16
+HIGH_CONFIDENCE_SCORE = 0.75
+
+# Memoised search outcomes keyed on video/photo content, colors and scan profile
+search_cache = SearchResultCache(max_entries=SEARCH_CACHE_SIZE)
+
+# Memory-mapped per-video face embeddings
+embedding_store = EmbeddingStore(EMBEDDINGS_DIR)
+
+# Guards search counts and history, which worker threads update concurrently
+search_results_lock = threading.Lock()
+
+# Bounded worker pool for CPU-heavy scans
+search_scheduler = SearchScheduler(
+    max_concurrent=MAX_CONCURRENT_SEARCHES,
+    max_queued=MAX_QUEUED_SEARCHES,
+    high_confidence=HIGH_CONFIDENCE_SCORE
+)
 
 # Create directories
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -36,14 +63,17 @@ os.makedirs(PHOTOS_DIR, exist_ok=True)
 
 # Lazy load model
 search_missing_person_api = None
+search_missing_person_indexed_api = None
 
 def load_model():
     """Lazy load the model only when needed"""
-    global search_missing_person_api
+    global search_missing_person_api, search_missing_person_indexed_api
     if search_missing_person_api is None:
         try:
             from model import search_missing_person_api as smp_api
+            from model import search_missing_person_indexed_api as smp_indexed_api
             search_missing_person_api = smp_api
+            search_missing_person_indexed_api = smp_indexed_api
             print("✅ Model loaded successfully")
         except ImportError as e:
             print(f"❌ Failed to load model: {str(e)}")
@@ -63,7 +93,12 @@ def health_check():
         "service": "Missing Person Search API",
         "uploaded_videos": len(uploaded_videos),
         "missing_persons": len(missing_persons),
-        "search_results": len(search_results)
+        "search_results": len(search_results),
+        "search_cache": search_cache.stats(),
+        "embedding_store": embedding_store.stats(),
+        "inference_backend": backend_profile(),
+        "face_detector": detector_profile(),
+        "search_scheduler": search_scheduler.stats()
     }
 
 # ==================== USER ENDPOINTS ====================
@@ -108,7 +143,7 @@ async def report_missing_person(
         photo_path = os.path.join(PHOTOS_DIR, photo_filename)
         
         with open(photo_path, "wb") as buffer:
-            shutil.copyfileobj(photo.file, buffer)
+            photo_hash = copy_and_hash(photo.file, buffer)
         
         # Store metadata
         missing_persons[person_id] = {
@@ -124,6 +159,7 @@ async def report_missing_person(
             "contact_info": contact_info,
             "photo_filename": photo_filename,
             "photo_path": photo_path,
+            "photo_hash": photo_hash,
             "reported_date": datetime.now().isoformat(),
             "status": "pending",
             "search_count": 0
@@ -167,7 +203,7 @@ async def upload_video(
         video_path = os.path.join(UPLOAD_DIR, f"{video_id}.mp4")
         
         with open(video_path, "wb") as buffer:
-            shutil.copyfileobj(video.file, buffer)
+            content_hash = copy_and_hash(video.file, buffer)
         
         uploaded_videos[video_id] = {
             "id": video_id,
@@ -179,6 +215,7 @@ async def upload_video(
             "upload_date": datetime.now().isoformat(),
             "status": "ready",
             "size": os.path.getsize(video_path),
+            "content_hash": content_hash,
             "search_count": 0
         }
         
@@ -216,12 +253,61 @@ def delete_video(video_id: str):
         if os.path.exists(video_path):
             os.remove(video_path)
         
+        search_cache.invalidate_video(uploaded_videos[video_id]["content_hash"])
+        embedding_store.delete(video_id)
         del uploaded_videos[video_id]
         
         return {"success": True, "message": "Video deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting video: {str(e)}")
 
+@app.post("/admin/videos/{video_id}/index")
+async def index_video(video_id: str, dtype: str = Form(default="float32")):
+    """
+    Build the face embedding index for a video.
+    
+    Parameters:
+    - dtype: Storage precision for embeddings (float32, float16 or int8)
+    """
+    if video_id not in uploaded_videos:
+        raise HTTPException(status_code=404, detail="Video not found")
+    
+    if dtype not in SUPPORTED_DTYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported dtype. Use one of: {', '.join(SUPPORTED_DTYPES)}")
+    
+    try:
+        from model import extract_video_embeddings
+    except ImportError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load model: {str(e)}")
+    
+    video_path = uploaded_videos[video_id]["path"]
+    
+    def build_index():
+        embeddings, frames, timestamps, boxes = extract_video_embeddings(video_path)
+        return embedding_store.write(video_id, embeddings, frames, timestamps, boxes, dtype=dtype)
+    
+    try:
+        # Indexing is as CPU-heavy as a search, so it shares the search worker pool
+        meta = await asyncio.wrap_future(search_scheduler.submit(build_index))
+        
+        if video_id not in uploaded_videos:
+            # Deleted while indexing ran; don't leave an orphaned index behind
+            embedding_store.delete(video_id)
+            raise HTTPException(status_code=404, detail="Video was deleted while indexing")
+        
+        uploaded_videos[video_id]["embedding_index"] = meta
+        
+        # Indexed searches now answer for this video, so drop full-scan results
+        search_cache.invalidate_video(uploaded_videos[video_id]["content_hash"])
+        
+        return {"success": True, "message": "Video indexed successfully", "index": meta}
+    except SchedulerOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error indexing video: {str(e)}")
+
 # ==================== ADMIN MISSING PERSONS ENDPOINTS ====================
 
 @app.get("/admin/missing-persons")
@@ -283,6 +369,7 @@ def delete_missing_person(person_id: str):
         if os.path.exists(photo_path):
             os.remove(photo_path)
         
+        search_cache.invalidate_photo(missing_persons[person_id]["photo_hash"])
         del missing_persons[person_id]
         
         return {"success": True, "message": "Missing person record deleted successfully"}
@@ -291,6 +378,92 @@ def delete_missing_person(person_id: str):
 
 # ==================== ADMIN SEARCH ENDPOINT ====================
 
+def get_cache_key(person: dict, video: dict):
+    profile = f"{SCAN_PROFILE_VERSION}/{backend_profile()}/{detector_profile()}"
+    if embedding_store.exists(video["id"]):
+        profile += f"/indexed-{embedding_store.meta(video['id'])['dtype']}"
+    
+    return make_key(
+        video["content_hash"],
+        person["photo_hash"],
+        person["shirt_color"],
+        person["pant_color"],
+        profile=profile
+    )
+
+def scan_video(person: dict, video: dict, stop_event=None):
+    """
+    Run the model over one video and memoise the outcome.
+    
+    Videos with an embedding index are searched through the index; others
+    fall back to a full scan of the video.
+    
+    Returns (result_bytes, score), or None if the scan was stopped via stop_event.
+    """
+    load_model()
+    
+    if embedding_store.exists(video["id"]):
+        result_image, score = search_missing_person_indexed_api(
+            video_path=video["path"],
+            target_photo=person["photo_path"],
+            shirt_color_text=person["shirt_color"],
+            pant_color_text=person["pant_color"],
+            store=embedding_store,
+            video_id=video["id"],
+            stop_event=stop_event,
+            return_score=True
+        )
+    else:
+        result_image, score = search_missing_person_api(
+            video_path=video["path"],
+            target_photo=person["photo_path"],
+            shirt_color_text=person["shirt_color"],
+            pant_color_text=person["pant_color"],
+            stop_event=stop_event,
+            return_score=True
+        )
+    
+    if result_image is None and stop_event is not None and stop_event.is_set():
+        return None
+    
+    if result_image is not None:
+        _, buffer = cv2.imencode('.jpg', result_image)
+        result = (buffer.tobytes(), float(score))
+    else:
+        result = (NO_MATCH, 0.0)
+    
+    search_cache.put(get_cache_key(person, video), result)
+    return result
+
+def record_search(person_id: str, video_id: str, status: str):
+    """Update search counts and history for a completed search. Returns the result ID."""
+    person = missing_persons[person_id]
+    video = uploaded_videos[video_id]
+    
+    # Result IDs are numbered from len(search_results), so numbering and
+    # insertion must happen atomically or two searches can share an ID
+    with search_results_lock:
+        person["search_count"] += 1
+        video["search_count"] += 1
+        
+        result_id = f"result_{len(search_results) + 1}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        search_results[result_id] = {
+            "id": result_id,
+            "person_id": person_id,
+            "person_name": person["name"],
+            "video_id": video_id,
+            "video_filename": video["filename"],
+            "location": video["location"],
+            "department": video["department"],
+            "search_date": datetime.now().isoformat(),
+            "status": status
+        }
+        
+        if status == "match_found":
+            person["status"] = "found"
+    
+    return result_id
+
 @app.post("/admin/search")
 async def search_person_in_video(
     person_id: str = Form(...),
@@ -314,9 +487,6 @@ async def search_person_in_video(
     if video_id not in uploaded_videos:
         raise HTTPException(status_code=404, detail="Video not found")
     
-    # Load model
-    load_model()
-    
     # Get data
     person = missing_persons[person_id]
     video = uploaded_videos[video_id]
@@ -334,39 +504,21 @@ async def search_person_in_video(
         print(f"🏢 Department: {video['department']}")
         print(f"{'='*60}\n")
         
-        # Call the search function
-        result_image = search_missing_person_api(
-            video_path=video["path"],
-            target_photo=person["photo_path"],
-            shirt_color_text=person["shirt_color"],
-            pant_color_text=person["pant_color"]
-        )
+        cached_result = search_cache.get(get_cache_key(person, video))
         
-        # Update search counts
-        missing_persons[person_id]["search_count"] += 1
-        uploaded_videos[video_id]["search_count"] += 1
+        if cached_result is not None:
+            print(f"⚡ Cache hit - returning memoised result")
+            result_bytes, _ = cached_result
+        else:
+            # Run the scan on the bounded worker pool so the event loop stays free
+            future = search_scheduler.submit(scan_video, person, video)
+            result_bytes, _ = await asyncio.wrap_future(future)
         
-        if result_image is not None:
+        if result_bytes != NO_MATCH:
             # Match found! Store result and return image
-            result_id = f"result_{len(search_results) + 1}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            
-            search_results[result_id] = {
-                "id": result_id,
-                "person_id": person_id,
-                "person_name": person["name"],
-                "video_id": video_id,
-                "video_filename": video["filename"],
-                "location": video["location"],
-                "department": video["department"],
-                "search_date": datetime.now().isoformat(),
-                "status": "match_found"
-            }
-            
-            # Update person status
-            missing_persons[person_id]["status"] = "found"
+            result_id = record_search(person_id, video_id, "match_found")
             
-            _, buffer = cv2.imencode('.jpg', result_image)
-            image_bytes = io.BytesIO(buffer.tobytes())
+            image_bytes = io.BytesIO(result_bytes)
             
             print(f"✅ MATCH FOUND!")
             print(f"{'='*60}\n")
@@ -393,19 +545,7 @@ async def search_person_in_video(
             )
         else:
             # No match found
-            result_id = f"result_{len(search_results) + 1}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            
-            search_results[result_id] = {
-                "id": result_id,
-                "person_id": person_id,
-                "person_name": person["name"],
-                "video_id": video_id,
-                "video_filename": video["filename"],
-                "location": video["location"],
-                "department": video["department"],
-                "search_date": datetime.now().isoformat(),
-                "status": "no_match"
-            }
+            record_search(person_id, video_id, "no_match")
             
             print(f"❌ NO MATCH FOUND")
             print(f"{'='*60}\n")
@@ -415,11 +555,94 @@ async def search_person_in_video(
                 detail=f"No match found for {person['name']} in {video['filename']}"
             )
             
+    except SchedulerOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing search: {str(e)}")
 
+# ==================== ADMIN SEARCH JOBS ====================
+
+@app.post("/admin/search-jobs")
+def create_search_job(person_id: str = Form(...)):
+    """
+    Search for a missing person across all uploaded videos.
+    
+    Videos whose location and time window best match the person's last seen
+    location and report date are searched first. Remaining videos are
+    skipped once a high-confidence match is found.
+    
+    Parameters:
+    - person_id: ID of the missing person
+    
+    Returns:
+    - Job ID and the prioritised list of videos; poll the job for results
+    """
+    if person_id not in missing_persons:
+        raise HTTPException(status_code=404, detail="Missing person not found")
+    
+    person = missing_persons[person_id]
+    ranked = rank_videos(person, list(uploaded_videos.values()))
+    
+    def run_one(video_id: str, stop_event):
+        video = uploaded_videos.get(video_id)
+        current_person = missing_persons.get(person_id)
+        if video is None or current_person is None:
+            return "cancelled", None, None
+        
+        result = search_cache.get(get_cache_key(current_person, video))
+        if result is None:
+            result = scan_video(current_person, video, stop_event=stop_event)
+            if result is None:
+                return "cancelled", None, None
+        
+        result_bytes, score = result
+        status = "match_found" if result_bytes != NO_MATCH else "no_match"
+        record_search(person_id, video_id, status)
+        return status, score, result_bytes if status == "match_found" else None
+    
+    try:
+        job = search_scheduler.submit_job(person_id, ranked, run_one)
+    except SchedulerOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "job_id": job.id,
+        "message": f"Searching {len(ranked)} videos for {person['name']}",
+        "job": job.to_dict()
+    })
+
+@app.get("/admin/search-jobs/{job_id}")
+def get_search_job(job_id: str):
+    """
+    Get the progress and matches of a search job, in priority order.
+    """
+    job = search_scheduler.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Search job not found")
+    
+    return {"success": True, "job": job.to_dict()}
+
+@app.get("/admin/search-jobs/{job_id}/matches/{video_id}/image")
+def get_search_job_match_image(job_id: str, video_id: str):
+    """
+    Get the matched frame found by a search job in a specific video.
+    """
+    job = search_scheduler.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Search job not found")
+    
+    if video_id not in job.images:
+        raise HTTPException(status_code=404, detail="No match found in this video")
+    
+    return StreamingResponse(
+        io.BytesIO(job.images[video_id]),
+        media_type="image/jpeg",
+        headers={"Content-Disposition": f"inline; filename=match_{video_id}.jpg"}
+    )
+
 # ==================== SEARCH HISTORY ====================
 
 @app.get("/admin/search-history")
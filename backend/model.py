@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 import os
+import threading
 from sklearn.metrics.pairwise import cosine_similarity
 import warnings
 warnings.filterwarnings('ignore')
@@ -10,22 +11,42 @@ import logging
 logging.getLogger('tensorflow').setLevel(logging.ERROR)
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'  # 0=all, 1=info, 2=warning, 3=error only
 
-# Suppress TensorFlow progress bars
-os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
-
-# Import TensorFlow and models
-import tensorflow as tf
+# Import TensorFlow with the configured threading / oneDNN settings
+from inference import configure_tensorflow, load_embedder
+from detectors import load_face_detector
+tf = configure_tensorflow()
 tf.get_logger().setLevel('ERROR')
 
-from mtcnn import MTCNN
-from keras_facenet import FaceNet
-
-# Initialize Models
+# Initialize Models (backends selected via FACE_DETECTOR / FACENET_BACKEND,
+# see detectors.py and inference.py)
 print("🔄 Loading face recognition models...")
-detector = MTCNN()
-embedder = FaceNet()
+detector = load_face_detector()
+embedder = load_embedder()
 print("✅ Models loaded successfully!")
 
+# TFLite interpreters and YuNet keep per-call state, so concurrent search
+# workers each get their own detector/embedder. The first thread to ask
+# reuses the instances loaded above.
+_thread_models = threading.local()
+_thread_models_lock = threading.Lock()
+_shared_models_claimed = False
+
+def get_models():
+    """Return this thread's (detector, embedder), loading them on first use."""
+    global _shared_models_claimed
+    if not hasattr(_thread_models, "detector"):
+        with _thread_models_lock:
+            if not _shared_models_claimed:
+                _shared_models_claimed = True
+                _thread_models.detector, _thread_models.embedder = detector, embedder
+            else:
+                print(f"🔄 Loading face recognition models for {threading.current_thread().name}...")
+                _thread_models.detector, _thread_models.embedder = load_face_detector(), load_embedder()
+    return _thread_models.detector, _thread_models.embedder
+
+# Best-scoring stored faces whose frames are decoded in an indexed search
+INDEXED_CANDIDATES = 20
+
 # --- TOOL 1: TEXT-BASED COLOR MATCHER ---
 def get_color_presence(image_crop, target_color_name):
     """
@@ -84,6 +105,7 @@ def get_color_presence(image_crop, target_color_name):
 
 # --- TOOL 2: FACE EMBEDDING ---
 def get_face_embedding_internal(image_path):
+    detector, embedder = get_models()
     img = cv2.imread(image_path)
     if img is None: return None
     img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
@@ -95,6 +117,44 @@ def get_face_embedding_internal(image_path):
     face_pixels = np.expand_dims(face, axis=0)
     return embedder.embeddings(face_pixels)[0]
 
+# --- TOOL 2B: VIDEO FACE INDEXING ---
+def extract_video_embeddings(video_path):
+    """
+    Sample the video once per second and embed every detected face.
+
+    Returns (embeddings, frames, timestamps, boxes) ready for EmbeddingStore.write.
+    """
+    detector, embedder = get_models()
+    cap = cv2.VideoCapture(video_path)
+    fps = int(cap.get(cv2.CAP_PROP_FPS)) or 1
+    frame_count = 0
+    embeddings, frames, timestamps, boxes = [], [], [], []
+
+    while True:
+        success, frame = cap.read()
+        if not success: break
+
+        if frame_count % fps == 0:
+            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            for face_data in detector.detect_faces(frame_rgb):
+                x, y, w, h = face_data['box']
+                x, y = max(0, x), max(0, y)
+                face_img = frame_rgb[y:y+h, x:x+w]
+                try:
+                    face_resized = cv2.resize(face_img, (160, 160))
+                except Exception:
+                    continue
+                embeddings.append(embedder.embeddings(np.expand_dims(face_resized, axis=0))[0])
+                frames.append(frame_count)
+                timestamps.append(frame_count / fps)
+                boxes.append((x, y, w, h))
+
+        frame_count += 1
+
+    cap.release()
+    print(f"🗂️ Indexed {len(embeddings)} faces from {video_path}")
+    return np.array(embeddings, dtype=np.float32).reshape(-1, 512), frames, timestamps, boxes
+
 # --- TOOL 3: ORIGINAL CONSOLE VERSION ---
 def search_missing_person(video_path, target_photo, shirt_color_text, pant_color_text="none"):
     print(f"🎥 SCANNING VIDEO: {video_path}")
@@ -104,6 +164,8 @@ def search_missing_person(video_path, target_photo, shirt_color_text, pant_color
         print(f"👖 EXPECTING PANTS: {pant_color_text.upper()}")
     print("-" * 50)
 
+    detector, embedder = get_models()
+
     # 1. Load Face Target
     target_emb = get_face_embedding_internal(target_photo)
     if target_emb is None:
@@ -211,14 +273,79 @@ def search_missing_person(video_path, target_photo, shirt_color_text, pant_color
     if not match_found:
         print("❌ Search ended. No person matching both Face & Description found.")
 
+# --- TOOL 3B: CANDIDATE SCORING (shared by the API searches) ---
+def score_candidate(frame, box, face_score, shirt_color_text, pant_color_text="none"):
+    """
+    Fuse a face score with the clothing colors below the face and, if it is
+    a match, draw the face/shirt boxes and label onto frame (in place).
+
+    Returns (final_score, clothing_score, matched).
+    """
+    x, y, w, h = box
+
+    # B. BODY ESTIMATION
+    img_h, img_w, _ = frame.shape
+
+    shirt_x1 = max(0, x - w)
+    shirt_x2 = min(img_w, x + 2*w)
+    shirt_y1 = y + h
+    shirt_y2 = min(img_h, y + h + int(2.5*h))
+
+    shirt_crop = frame[shirt_y1:shirt_y2, shirt_x1:shirt_x2]
+
+    # C. CLOTHING CHECK
+    shirt_score = get_color_presence(shirt_crop, shirt_color_text)
+
+    pant_score = 0.0
+    if pant_color_text != "none":
+        pant_y1 = shirt_y2
+        pant_y2 = min(img_h, pant_y1 + 3*h)
+        pant_crop = frame[pant_y1:pant_y2, shirt_x1:shirt_x2]
+        pant_score = get_color_presence(pant_crop, pant_color_text)
+        clothing_score = (shirt_score + pant_score) / 2
+    else:
+        clothing_score = shirt_score
+
+    # D. FUSION
+    final_score = (face_score * 0.70) + (clothing_score * 0.30)
+
+    # E. DRAW RESULTS
+    if final_score > 0.55:
+        color = (0, 255, 0)
+        status = "MATCH FOUND"
+    elif face_score > 0.60:
+        color = (0, 165, 255)
+        status = "FACE MATCH (Check Clothes)"
+    else:
+        return final_score, clothing_score, False
+
+    # Draw Face Box
+    cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
+
+    # Draw Shirt Box
+    cv2.rectangle(frame, (shirt_x1, shirt_y1), (shirt_x2, shirt_y2), (255, 0, 0), 2)
+    cv2.putText(frame, "Shirt Area", (shirt_x1, shirt_y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
+
+    # Text
+    label = f"{status}: {final_score*100:.0f}%"
+    cv2.rectangle(frame, (x, y-30), (x+w+100, y), color, -1)
+    cv2.putText(frame, label, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+    return final_score, clothing_score, True
+
 # --- TOOL 4: API VERSION (Returns Image) ---
-def search_missing_person_api(video_path, target_photo, shirt_color_text, pant_color_text="none"):
+def search_missing_person_api(video_path, target_photo, shirt_color_text, pant_color_text="none",
+                              stop_event=None, return_score=False):
     """
     API-friendly version that returns the matched frame image instead of displaying it.
     
+    Parameters:
+    - stop_event: optional threading.Event; the scan stops early once it is set
+    - return_score: also return the fused match score as (frame, score)
+    
     Returns:
     - matched_frame: numpy array (BGR image) if match found
-    - None: if no match found
+    - None: if no match found (or the scan was stopped)
     """
     print(f"🎥 SCANNING VIDEO: {video_path}")
     print(f"👤 LOOKING FOR FACE FROM: {target_photo}")
@@ -227,17 +354,23 @@ def search_missing_person_api(video_path, target_photo, shirt_color_text, pant_c
         print(f"👖 EXPECTING PANTS: {pant_color_text.upper()}")
     print("-" * 50)
 
+    detector, embedder = get_models()
+
     # 1. Load Face Target
     target_emb = get_face_embedding_internal(target_photo)
     if target_emb is None:
         print("❌ Error: No face found in the provided photo.")
-        return None
+        return (None, 0.0) if return_score else None
 
     cap = cv2.VideoCapture(video_path)
     fps = int(cap.get(cv2.CAP_PROP_FPS))
     frame_count = 0
 
     while True:
+        if stop_event is not None and stop_event.is_set():
+            print("⏹️ Scan stopped early.")
+            break
+
         success, frame = cap.read()
         if not success: break
 
@@ -258,66 +391,68 @@ def search_missing_person_api(video_path, target_photo, shirt_color_text, pant_c
                     face_score = cosine_similarity([target_emb], [curr_emb])[0][0]
 
                     if face_score > 0.40:
-                        # B. BODY ESTIMATION
-                        img_h, img_w, _ = frame.shape
+                        final_score, clothing_score, matched = score_candidate(
+                            frame, (x, y, w, h), face_score, shirt_color_text, pant_color_text
+                        )
 
-                        shirt_x1 = max(0, x - w)
-                        shirt_x2 = min(img_w, x + 2*w)
-                        shirt_y1 = y + h
-                        shirt_y2 = min(img_h, y + h + int(2.5*h))
+                        print(f"⏱️ {frame_count/fps:.0f}s | Face: {face_score:.2f} | Clothes: {clothing_score:.2f} | FINAL: {final_score:.2f}")
 
-                        shirt_crop = frame[shirt_y1:shirt_y2, shirt_x1:shirt_x2]
+                        if matched:
+                            cap.release()
+                            print("✅ Match found! Returning frame.")
+                            return (frame, final_score) if return_score else frame
 
-                        # C. CLOTHING CHECK
-                        shirt_score = get_color_presence(shirt_crop, shirt_color_text)
+                except Exception as e:
+                    pass
 
-                        pant_score = 0.0
-                        if pant_color_text != "none":
-                            pant_y1 = shirt_y2
-                            pant_y2 = min(img_h, pant_y1 + 3*h)
-                            pant_crop = frame[pant_y1:pant_y2, shirt_x1:shirt_x2]
-                            pant_score = get_color_presence(pant_crop, pant_color_text)
-                            clothing_score = (shirt_score + pant_score) / 2
-                        else:
-                            clothing_score = shirt_score
+        frame_count += 1
 
-                        # D. FUSION
-                        final_score = (face_score * 0.70) + (clothing_score * 0.30)
+    cap.release()
+    print("❌ No match found.")
+    return (None, 0.0) if return_score else None
 
-                        print(f"⏱️ {frame_count/fps:.0f}s | Face: {face_score:.2f} | Clothes: {clothing_score:.2f} | FINAL: {final_score:.2f}")
 
-                        # E. DRAW RESULTS
-                        if final_score > 0.55:
-                            color = (0, 255, 0)
-                            status = "MATCH FOUND"
-                        elif face_score > 0.60:
-                            color = (0, 165, 255)
-                            status = "FACE MATCH (Check Clothes)"
-                        else:
-                            color = None
+# --- TOOL 5: INDEXED API VERSION (uses the embedding store) ---
+def search_missing_person_indexed_api(video_path, target_photo, shirt_color_text, pant_color_text="none",
+                                      store=None, video_id=None, stop_event=None, return_score=False):
+    """
+    Same contract as search_missing_person_api, for videos that have been
+    indexed into an EmbeddingStore.
 
-                        if color:
-                            # Draw Face Box
-                            cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
+    The reference face is embedded once and scored against the stored
+    embeddings over mmap'd data; only the frames of the best face hits are
+    decoded to check clothing and draw the result.
+    """
+    print(f"🗂️ INDEXED SEARCH: {video_path}")
 
-                            # Draw Shirt Box
-                            cv2.rectangle(frame, (shirt_x1, shirt_y1), (shirt_x2, shirt_y2), (255, 0, 0), 2)
-                            cv2.putText(frame, "Shirt Area", (shirt_x1, shirt_y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
+    target_emb = get_face_embedding_internal(target_photo)
+    if target_emb is None:
+        print("❌ Error: No face found in the provided photo.")
+        return (None, 0.0) if return_score else None
 
-                            # Text
-                            label = f"{status}: {final_score*100:.0f}%"
-                            cv2.rectangle(frame, (x, y-30), (x+w+100, y), color, -1)
-                            cv2.putText(frame, label, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    hits = store.search(video_id, target_emb, top_k=INDEXED_CANDIDATES, min_score=0.40)
+    print(f"🔎 {len(hits)} candidate faces above the face threshold")
 
-                            cap.release()
-                            print("✅ Match found! Returning frame.")
-                            return frame
+    cap = cv2.VideoCapture(video_path)
+    for hit in hits:
+        if stop_event is not None and stop_event.is_set():
+            print("⏹️ Scan stopped early.")
+            break
 
-                except Exception as e:
-                    pass
+        cap.set(cv2.CAP_PROP_POS_FRAMES, hit["frame"])
+        success, frame = cap.read()
+        if not success: continue
 
-        frame_count += 1
+        final_score, clothing_score, matched = score_candidate(
+            frame, hit["box"], hit["score"], shirt_color_text, pant_color_text
+        )
+        print(f"⏱️ {hit['timestamp']:.0f}s | Face: {hit['score']:.2f} | Clothes: {clothing_score:.2f} | FINAL: {final_score:.2f}")
+
+        if matched:
+            cap.release()
+            print("✅ Match found! Returning frame.")
+            return (frame, final_score) if return_score else frame
 
     cap.release()
     print("❌ No match found.")
-    return None
\ No newline at end of file
+    return (None, 0.0) if return_score else None
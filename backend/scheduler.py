@@ -0,0 +1,309 @@
+import heapq
+import itertools
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when a search cannot be admitted because the queue is full."""
+
+
+# Queue priority of single interactive searches/indexing; rank_videos
+# priorities are in [0, 1], so these always run ahead of queued job videos.
+INTERACTIVE_PRIORITY = 2.0
+
+
+# --- VIDEO PRIORITISATION ---
+def _tokens(text):
+    return set(re.findall(r"[a-z0-9]+", (text or "").lower()))
+
+
+def location_score(last_seen_location, video_location):
+    """
+    0.0 to 1.0 similarity between a person's last seen location and a
+    camera location. When all the words of one appear in the other
+    ("Main St" and "Main St Station") it scores 1.0; otherwise the share of
+    overlapping words.
+    """
+    ta, tb = _tokens(last_seen_location), _tokens(video_location)
+    if not ta or not tb:
+        return 0.0
+    if ta <= tb or tb <= ta:
+        return 1.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def parse_time_window(upload_date, time_window):
+    """
+    Convert an upload's time_window ("1hour", "2hours", ...) into the
+    (start, end) datetimes the footage covers, ending at upload time.
+    Returns None if either value cannot be parsed.
+    """
+    match = re.search(r"(\d+)\s*h", (time_window or "").lower())
+    if not match:
+        return None
+    try:
+        end = datetime.fromisoformat(upload_date)
+    except (TypeError, ValueError):
+        return None
+    return end - timedelta(hours=int(match.group(1))), end
+
+
+def time_score(reported_date, upload_date, time_window, decay_hours=24.0):
+    """
+    0.0 to 1.0 closeness between when a person was reported and the
+    footage's time window: 1.0 if the report falls inside the window,
+    decaying with the gap in hours otherwise. Unknown times score 0.5.
+    """
+    window = parse_time_window(upload_date, time_window)
+    try:
+        reported = datetime.fromisoformat(reported_date)
+    except (TypeError, ValueError):
+        reported = None
+    if window is None or reported is None:
+        return 0.5
+
+    start, end = window
+    if start <= reported <= end:
+        return 1.0
+    gap = min(abs((reported - start).total_seconds()), abs((reported - end).total_seconds())) / 3600
+    return 1.0 / (1.0 + gap / decay_hours)
+
+
+def rank_videos(person, videos, location_weight=0.6, time_weight=0.4):
+    """
+    Order videos by how likely they are to contain the person.
+
+    Returns a list of (priority, video) tuples, highest priority first.
+    """
+    ranked = []
+    for video in videos:
+        priority = (
+            location_weight * location_score(person.get("last_seen_location"), video.get("location"))
+            + time_weight * time_score(person.get("reported_date"), video.get("upload_date"), video.get("time_window"))
+        )
+        ranked.append((round(priority, 4), video))
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    return ranked
+
+
+# --- SCHEDULER ---
+class SearchJob:
+    """A person searched across many videos, tracked per video."""
+
+    def __init__(self, person_id):
+        self.id = f"job_{uuid.uuid4().hex[:12]}"
+        self.person_id = person_id
+        self.created = datetime.now().isoformat()
+        self.stop_event = threading.Event()
+        self.stopped_early = False
+        self.entries = OrderedDict()
+        self.images = {}
+        # (priority, entry) waiting for one of the job's own slots, best first
+        self.pending = []
+
+    def add(self, video, priority, status):
+        self.entries[video["id"]] = {
+            "video_id": video["id"],
+            "video_filename": video.get("filename"),
+            "location": video.get("location"),
+            "priority": priority,
+            "status": status,
+            "score": None,
+        }
+
+    @property
+    def done(self):
+        return all(e["status"] not in ("pending", "queued", "running") for e in self.entries.values())
+
+    def to_dict(self):
+        entries = list(self.entries.values())
+        return {
+            "id": self.id,
+            "person_id": self.person_id,
+            "created": self.created,
+            "done": self.done,
+            "stopped_early": self.stopped_early,
+            "matches": [e for e in entries if e["status"] == "match_found"],
+            "videos": entries,
+        }
+
+
+class SearchScheduler:
+    """
+    Runs CPU-heavy searches on a fixed pool of worker threads.
+
+    At most max_concurrent searches run at once and at most max_queued wait
+    behind them; anything beyond that is shed with SchedulerOverloaded so
+    the API host is never oversubscribed.
+
+    Waiting work is kept in one priority queue shared by all jobs, so the
+    most likely sightings across every person run first, and interactive
+    searches jump ahead of queued job videos. A single job holds at most
+    job_share of all slots at a time, leaving room for other work; its
+    remaining videos wait as "pending" and take over the job's slots as its
+    own searches finish.
+    """
+
+    def __init__(self, max_concurrent=2, max_queued=16, high_confidence=0.75, max_jobs=100, job_share=0.5):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.high_confidence = high_confidence
+        self.max_jobs = max_jobs
+        self.max_job_slots = max(1, int((max_concurrent + max_queued) * job_share))
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="search")
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._queue = []
+        self._sequence = itertools.count()
+        self.jobs = OrderedDict()
+        self.completed = 0
+        self.shed = 0
+        self.early_stops = 0
+
+    def _admit(self, count):
+        """Reserve up to count slots; returns how many were granted."""
+        with self._lock:
+            free = self.max_concurrent + self.max_queued - self._inflight
+            granted = max(0, min(count, free))
+            self._inflight += granted
+            return granted
+
+    def _reject(self):
+        with self._lock:
+            self.shed += 1
+        raise SchedulerOverloaded("Too many searches in progress, try again later")
+
+    def _release(self):
+        with self._lock:
+            self._inflight -= 1
+            self.completed += 1
+
+    def _enqueue(self, priority, fn, future=None):
+        """Queue an admitted task; a worker picks the highest-priority task when it frees up."""
+        with self._lock:
+            # The sequence number keeps equal priorities FIFO
+            heapq.heappush(self._queue, (-priority, next(self._sequence), fn, future))
+        self._executor.submit(self._run_next)
+
+    def _run_next(self):
+        with self._lock:
+            _, _, fn, future = heapq.heappop(self._queue)
+        # Job tasks return True when they handed their slot to the job's next video
+        kept_slot = False
+        try:
+            if future is None:
+                kept_slot = bool(fn())
+            elif future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn())
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            if kept_slot:
+                with self._lock:
+                    self.completed += 1
+            else:
+                self._release()
+
+    def submit(self, fn, *args, priority=INTERACTIVE_PRIORITY, **kwargs):
+        """Run a single search under admission control. Returns a Future."""
+        if not self._admit(1):
+            self._reject()
+        future = Future()
+        self._enqueue(priority, lambda: fn(*args, **kwargs), future)
+        return future
+
+    def submit_job(self, person_id, ranked_videos, run_one):
+        """
+        Fan a person's search out across videos in priority order.
+
+        run_one(video_id, stop_event) must return (status, score, image_bytes)
+        where status is "match_found", "no_match" or "cancelled". The job
+        starts with as many videos as its share and the free slots allow; the
+        rest stay "pending" and run as the job's own searches finish. If the
+        queue is already full the whole job is rejected with SchedulerOverloaded.
+        """
+        job = SearchJob(person_id)
+        granted = self._admit(min(len(ranked_videos), self.max_job_slots))
+        if ranked_videos and not granted:
+            self._reject()
+
+        for i, (priority, video) in enumerate(ranked_videos):
+            job.add(video, priority, "queued" if i < granted else "pending")
+            if i >= granted:
+                job.pending.append((priority, job.entries[video["id"]]))
+
+        with self._lock:
+            self.jobs[job.id] = job
+            while len(self.jobs) > self.max_jobs:
+                self.jobs.popitem(last=False)
+
+        for priority, video in ranked_videos[:granted]:
+            entry = job.entries[video["id"]]
+            self._enqueue(priority, lambda entry=entry: self._run_job_entry(job, entry, run_one))
+        return job
+
+    def _run_job_entry(self, job, entry, run_one):
+        self._run_entry(job, entry, run_one)
+        return self._start_next_pending(job, run_one)
+
+    def _start_next_pending(self, job, run_one):
+        """
+        Hand a finished job task's slot to the job's next pending video.
+        Returns True if the slot was handed over.
+        """
+        with self._lock:
+            if not job.pending:
+                return False
+            if job.stop_event.is_set():
+                for _, entry in job.pending:
+                    entry["status"] = "skipped"
+                job.pending.clear()
+                return False
+            priority, entry = job.pending.pop(0)
+            entry["status"] = "queued"
+        self._enqueue(priority, lambda: self._run_job_entry(job, entry, run_one))
+        return True
+
+    def _run_entry(self, job, entry, run_one):
+        if job.stop_event.is_set():
+            entry["status"] = "skipped"
+            return
+
+        entry["status"] = "running"
+        try:
+            status, score, image = run_one(entry["video_id"], job.stop_event)
+        except Exception as e:
+            entry["status"] = "error"
+            entry["error"] = str(e)
+            return
+
+        entry["status"] = "skipped" if status == "cancelled" else status
+        entry["score"] = score
+        if status == "match_found":
+            job.images[entry["video_id"]] = image
+            if score is not None and score >= self.high_confidence and not job.stop_event.is_set():
+                print(f"🛑 High-confidence match ({score:.2f}) in {entry['video_id']}. Stopping job {job.id}.")
+                job.stop_event.set()
+                job.stopped_early = True
+                with self._lock:
+                    self.early_stops += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queued": self.max_queued,
+                "inflight": self._inflight,
+                "queued": len(self._queue),
+                "max_job_slots": self.max_job_slots,
+                "completed": self.completed,
+                "shed": self.shed,
+                "early_stops": self.early_stops,
+                "jobs": len(self.jobs),
+            }
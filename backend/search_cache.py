@@ -0,0 +1,98 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Bump whenever the scan in model.py changes in a way that can change its
+# answer (sampling rate, face/fusion thresholds, models), so stale entries
+# computed under the old profile are never served.
+SCAN_PROFILE_VERSION = "mtcnn-facenet/1fps/face0.40/match0.55/faceonly0.60"
+
+# Image bytes stored for searches that completed without a match, so a
+# repeated "no match" query is also answered from the cache.
+NO_MATCH = b""
+
+
+def copy_and_hash(src, dst, chunk_size=1024 * 1024):
+    """
+    Copy a file object to dst while hashing it, so uploads are read only
+    once. Returns the SHA-256 hex digest of the content.
+    """
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: src.read(chunk_size), b""):
+        digest.update(chunk)
+        dst.write(chunk)
+    return digest.hexdigest()
+
+
+def make_key(video_hash, photo_hash, shirt_color, pant_color, profile=SCAN_PROFILE_VERSION):
+    """Build the cache key for one search from everything that can change its result."""
+    return (
+        video_hash,
+        photo_hash,
+        (shirt_color or "").lower().strip(),
+        (pant_color or "none").lower().strip(),
+        profile,
+    )
+
+
+class SearchResultCache:
+    """
+    Bounded LRU cache of search outcomes.
+
+    Values are (image_bytes, score) tuples: the JPEG bytes of the matched
+    frame and its fused score, or (NO_MATCH, 0.0) when the scan finished
+    without a match.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value for key (marking it most recently used), or None on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_video(self, video_hash):
+        """Drop every entry computed against the given video content."""
+        return self._invalidate(lambda key: key[0] == video_hash)
+
+    def invalidate_photo(self, photo_hash):
+        """Drop every entry computed against the given reference photo."""
+        return self._invalidate(lambda key: key[1] == photo_hash)
+
+    def _invalidate(self, predicate):
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
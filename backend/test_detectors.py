@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+import detectors
+from detectors import CascadedDetector, iou
+
+
+class FixedDetector:
+    """Returns the same detections for every image, recording what it was given."""
+
+    def __init__(self, name, faces):
+        self.name = name
+        self.faces = faces
+        self.images = []
+
+    def detect_faces(self, image_rgb):
+        self.images.append(image_rgb)
+        return [dict(f, keypoints=dict(f["keypoints"])) if "keypoints" in f else dict(f) for f in self.faces]
+
+
+def frame(h=200, w=300):
+    return np.zeros((h, w, 3), dtype=np.uint8)
+
+
+def test_iou():
+    assert iou([0, 0, 10, 10], [0, 0, 10, 10]) == 1.0
+    assert iou([0, 0, 10, 10], [20, 20, 10, 10]) == 0.0
+    assert iou([0, 0, 10, 10], [5, 0, 10, 10]) == pytest.approx(50 / 150)
+    assert iou([0, 0, 0, 0], [0, 0, 0, 0]) == 0.0
+
+
+def test_cascade_without_proposals_skips_refiner():
+    refiner = FixedDetector("mtcnn", [{"box": [0, 0, 10, 10], "confidence": 0.9}])
+    cascade = CascadedDetector(FixedDetector("haar", []), refiner)
+
+    assert cascade.detect_faces(frame()) == []
+    assert refiner.images == []
+
+
+def test_cascade_maps_boxes_and_keypoints_to_frame():
+    proposer = FixedDetector("haar", [{"box": [100, 50, 40, 40], "confidence": 1.0}])
+    refiner = FixedDetector("mtcnn", [
+        {"box": [22, 21, 36, 38], "confidence": 0.98, "keypoints": {"nose": (40, 40)}},
+    ])
+    cascade = CascadedDetector(proposer, refiner, margin=0.5)
+
+    faces = cascade.detect_faces(frame())
+    # Proposal padded by 20px on each side: region starts at (80, 30) and is 80x80
+    assert refiner.images[0].shape[:2] == (80, 80)
+    assert faces == [{"box": [102, 51, 36, 38], "confidence": 0.98, "keypoints": {"nose": (120, 70)}}]
+    assert cascade.name == "cascade-haar"
+
+
+def test_cascade_clips_regions_at_frame_edge():
+    proposer = FixedDetector("haar", [{"box": [0, 0, 40, 40], "confidence": 1.0}])
+    refiner = FixedDetector("mtcnn", [{"box": [5, 5, 30, 30], "confidence": 0.9}])
+
+    faces = CascadedDetector(proposer, refiner, margin=0.5).detect_faces(frame())
+    assert refiner.images[0].shape[:2] == (60, 60)
+    assert faces[0]["box"] == [5, 5, 30, 30]
+
+
+def test_cascade_merges_overlapping_refinements():
+    # Two overlapping proposals whose padded regions both contain the same face
+    proposer = FixedDetector("haar", [
+        {"box": [100, 100, 40, 40], "confidence": 1.0},
+        {"box": [104, 102, 40, 40], "confidence": 1.0},
+    ])
+
+    # Padded regions start at (80, 80) and (84, 82); both contain the face at (102, 101)
+    responses = iter([
+        [{"box": [22, 21, 40, 40], "confidence": 0.95}],
+        [{"box": [18, 19, 40, 40], "confidence": 0.99}],
+    ])
+    refiner = FixedDetector("mtcnn", [])
+    refiner.detect_faces = lambda region: next(responses)
+
+    faces = CascadedDetector(proposer, refiner, margin=0.5).detect_faces(frame())
+    assert faces == [{"box": [102, 101, 40, 40], "confidence": 0.99}]
+
+
+def test_bounded_frames_stops_at_cap(monkeypatch):
+    decoded = []
+
+    def sample(path):
+        for i in range(5):
+            decoded.append((path, i))
+            yield (path, i)
+
+    monkeypatch.setattr(detectors, "_sample_frames", sample)
+    frames = list(detectors._bounded_frames(["a.mp4", "b.mp4"], max_frames=7))
+
+    assert frames == [("a.mp4", i) for i in range(5)] + [("b.mp4", 0), ("b.mp4", 1)]
+    # At most one extra frame is decoded before the cap is noticed
+    assert len(decoded) <= 8
+
+
+def test_failed_detector_falls_back_to_mtcnn(monkeypatch):
+    def fail(name):
+        raise FileNotFoundError("YUNET_MODEL_PATH '' not found")
+
+    monkeypatch.setattr(detectors, "FACE_DETECTOR", "yunet")
+    monkeypatch.setattr(detectors, "_loaded_name", None)
+    monkeypatch.setattr(detectors, "_build", fail)
+    monkeypatch.setattr(detectors, "MTCNNDetector", lambda: FixedDetector("mtcnn", []))
+
+    assert detectors.detector_profile() == "yunet"
+    assert detectors.load_face_detector().name == "mtcnn"
+    assert detectors.detector_profile() == "mtcnn"
+
+
+def test_loaded_cascade_is_reported(monkeypatch):
+    cascade = CascadedDetector(FixedDetector("yunet", []), FixedDetector("mtcnn", []))
+    monkeypatch.setattr(detectors, "FACE_DETECTOR", "cascade")
+    monkeypatch.setattr(detectors, "CASCADE_PROPOSER", "haar")
+    monkeypatch.setattr(detectors, "_loaded_name", None)
+    monkeypatch.setattr(detectors, "_build", lambda name: cascade)
+
+    assert detectors.detector_profile() == "cascade-haar"
+    detectors.load_face_detector()
+    assert detectors.detector_profile() == "cascade-yunet"
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from embedding_store import EMBEDDING_DIM, EmbeddingStore, cosine_scores, quantise, quantisation_report
+
+
+def random_embeddings(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, EMBEDDING_DIM)).astype(np.float32)
+
+
+def write(store, video_id, embeddings, dtype="float32"):
+    n = len(embeddings)
+    return store.write(video_id, embeddings, range(n), np.arange(n, dtype=np.float32), np.zeros((n, 4)), dtype=dtype)
+
+
+@pytest.mark.parametrize("dtype,tolerance", [("float32", 1e-6), ("float16", 1e-3), ("int8", 1e-2)])
+def test_quantised_scores_match_full_precision(dtype, tolerance):
+    embeddings = random_embeddings(50)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    query = embeddings[3]
+
+    data, scales = quantise(embeddings, dtype)
+    exact = embeddings @ query
+    assert np.abs(cosine_scores(data, scales, query, chunk_rows=7) - exact).max() < tolerance
+
+
+def test_int8_round_trip(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    embeddings = random_embeddings(20)
+    meta = write(store, "v1", embeddings, dtype="int8")
+
+    columns = store.open("v1")
+    assert meta["dtype"] == "int8"
+    assert columns["embeddings"].dtype == np.int8
+    assert columns["scales"].shape == (20,)
+
+    restored = columns["embeddings"].astype(np.float32) * columns["scales"][:, None]
+    expected = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    assert np.abs(restored - expected).max() < 0.01
+
+
+def test_search_returns_best_hit_first(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    embeddings = random_embeddings(30)
+    write(store, "v1", embeddings)
+
+    hits = store.search("v1", embeddings[12], top_k=3)
+    assert len(hits) == 3
+    assert hits[0]["frame"] == 12
+    assert hits[0]["score"] == pytest.approx(1.0, abs=1e-5)
+    assert [h["score"] for h in hits] == sorted((h["score"] for h in hits), reverse=True)
+
+
+def test_search_on_small_and_empty_stores(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    embeddings = random_embeddings(2)
+    write(store, "small", embeddings)
+    write(store, "empty", np.zeros((0, EMBEDDING_DIM)))
+
+    assert len(store.search("small", embeddings[0], top_k=10)) == 2
+    assert store.search("empty", embeddings[0]) == []
+
+
+def test_search_min_score(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    embeddings = random_embeddings(10)
+    write(store, "v1", embeddings)
+
+    hits = store.search("v1", embeddings[4], top_k=10, min_score=0.9)
+    assert [h["frame"] for h in hits] == [4]
+
+
+def test_delete_and_stats(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    write(store, "v1", random_embeddings(4), dtype="float16")
+    assert store.exists("v1")
+    assert store.meta("v1")["dtype"] == "float16"
+    assert store.stats() == {"videos": 1, "embedding_bytes": 4 * EMBEDDING_DIM * 2}
+
+    store.delete("v1")
+    assert not store.exists("v1")
+    assert store.stats() == {"videos": 0, "embedding_bytes": 0}
+
+
+def test_unsupported_dtype():
+    with pytest.raises(ValueError):
+        quantise(random_embeddings(1), "int4")
+
+
+def test_quantisation_report_footprints():
+    embeddings = random_embeddings(100)
+    report = {row["dtype"]: row for row in quantisation_report(embeddings, embeddings[:5])}
+    assert report["float32"]["max_abs_error"] < 1e-6
+    assert report["float16"]["footprint_ratio"] == 0.5
+    assert report["int8"]["footprint_ratio"] < 0.26
+
+
+def test_overwrite_leaves_no_temp_directories(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    write(store, "v1", random_embeddings(3))
+    write(store, "v1", random_embeddings(5), dtype="int8")
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["v1"]
+    assert store.open("v1")["meta"]["count"] == 5
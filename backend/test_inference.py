@@ -0,0 +1,68 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+import inference
+
+
+class FakeKeras:
+    name = "keras"
+
+
+@pytest.fixture(autouse=True)
+def reset_loaded(monkeypatch):
+    monkeypatch.setattr(inference, "_loaded", {"facenet": None, "mtcnn": None})
+
+
+def test_prewhiten_is_float32():
+    flat = np.zeros((160, 160, 3), dtype=np.uint8)
+    noisy = np.random.default_rng(0).integers(0, 256, size=(160, 160, 3), dtype=np.uint8)
+
+    assert inference.prewhiten(flat).dtype == np.float32
+    out = inference.prewhiten(noisy)
+    assert out.dtype == np.float32
+    assert out.mean() == pytest.approx(0.0, abs=1e-4)
+    assert out.std() == pytest.approx(1.0, abs=1e-4)
+
+
+def test_profile_reports_requested_backend_before_loading(monkeypatch):
+    monkeypatch.setattr(inference, "BACKEND", "tflite")
+    monkeypatch.setattr(inference, "MODEL_PATH", "/models/facenet.tflite")
+    monkeypatch.setattr(inference, "MTCNN_COMPILE", True)
+    assert inference.backend_profile() == "tflite:facenet.tflite/mtcnn-compiled"
+
+
+@pytest.mark.parametrize("backend", ["tflite", "onnx", "tensorrt"])
+def test_embedder_fallback_reports_keras(monkeypatch, backend):
+    monkeypatch.setattr(inference, "BACKEND", backend)
+    monkeypatch.setattr(inference, "MODEL_PATH", "/missing/facenet.model")
+    monkeypatch.setattr(inference, "KerasFaceNet", FakeKeras)
+
+    assert isinstance(inference.load_embedder(), FakeKeras)
+    assert inference._loaded["facenet"] == "keras"
+    assert inference.backend_profile().startswith("keras/")
+
+
+@pytest.mark.parametrize("stages,expected", [(3, "compiled"), (2, "compiled-2of3"), (0, "eager")])
+def test_detector_reports_compiled_stages(monkeypatch, stages, expected):
+    monkeypatch.setitem(sys.modules, "mtcnn", types.SimpleNamespace(MTCNN=object))
+    monkeypatch.setattr(inference, "MTCNN_COMPILE", True)
+    monkeypatch.setattr(inference, "compile_mtcnn", lambda detector: stages)
+
+    inference.load_detector()
+    assert inference._loaded["mtcnn"] == expected
+    assert inference.backend_profile().endswith(f"/mtcnn-{expected}")
+
+
+def test_detector_compile_failure_reports_eager(monkeypatch):
+    def fail(detector):
+        raise RuntimeError("no tf.function")
+
+    monkeypatch.setitem(sys.modules, "mtcnn", types.SimpleNamespace(MTCNN=object))
+    monkeypatch.setattr(inference, "MTCNN_COMPILE", True)
+    monkeypatch.setattr(inference, "compile_mtcnn", fail)
+
+    inference.load_detector()
+    assert inference._loaded["mtcnn"] == "eager"
@@ -0,0 +1,197 @@
+import threading
+
+import pytest
+
+from scheduler import SchedulerOverloaded, SearchScheduler, location_score, rank_videos, time_score
+
+
+def video(video_id, location="", upload_date="2026-01-01T12:00:00", time_window="2hours"):
+    return {"id": video_id, "location": location, "upload_date": upload_date, "time_window": time_window}
+
+
+def blocked_scheduler(**kwargs):
+    """A scheduler whose single worker is held busy until the returned event is set."""
+    scheduler = SearchScheduler(max_concurrent=1, **kwargs)
+    release = threading.Event()
+    started = threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    scheduler.submit(hold)
+    started.wait(5)
+    return scheduler, release
+
+
+def wait_for(job, scheduler=None):
+    """Wait until every video in the job has finished (and, if given, its slots are released)."""
+    for _ in range(500):
+        if job.done and (scheduler is None or scheduler.stats()["inflight"] == 0):
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_location_score():
+    assert location_score("Central Station", "central station east") == 1.0
+    assert location_score("Main Street Market", "Main Road") == pytest.approx(1 / 4)
+    assert location_score("", "Airport") == 0.0
+    # Containment is by whole words, not substrings
+    assert location_score("Park", "Parking Lot B") == 0.0
+    assert location_score("St", "Station Road") == 0.0
+    assert location_score("Main", "Germaine Ave") == 0.0
+
+
+def test_time_score():
+    assert time_score("2026-01-01T11:00:00", "2026-01-01T12:00:00", "2hours") == 1.0
+    assert time_score("2026-01-02T12:00:00", "2026-01-01T12:00:00", "2hours") == pytest.approx(0.5)
+    assert time_score("unknown", "2026-01-01T12:00:00", "2hours") == 0.5
+
+
+def test_rank_videos_prefers_location_and_time():
+    person = {"last_seen_location": "Central Station", "reported_date": "2026-01-01T11:00:00"}
+    ranked = rank_videos(person, [
+        video("far", "Airport", "2026-01-05T12:00:00"),
+        video("near", "Central Station"),
+        video("near_late", "Central Station", "2026-01-05T12:00:00"),
+    ])
+    assert [v["id"] for _, v in ranked] == ["near", "near_late", "far"]
+
+
+def test_submit_sheds_when_full():
+    scheduler, release = blocked_scheduler(max_queued=1)
+    scheduler.submit(lambda: None)
+    with pytest.raises(SchedulerOverloaded):
+        scheduler.submit(lambda: None)
+    release.set()
+    assert scheduler.stats()["shed"] == 1
+
+
+def test_job_share_leaves_room_for_interactive_searches():
+    scheduler, release = blocked_scheduler(max_queued=3, job_share=0.5)
+    job = scheduler.submit_job("p", [(0.5, video(f"v{i}")) for i in range(5)], lambda v, e: ("no_match", 0.0, None))
+
+    statuses = [e["status"] for e in job.entries.values()]
+    assert statuses.count("queued") == scheduler.max_job_slots
+    assert statuses.count("pending") == 5 - statuses.count("queued")
+    assert scheduler.submit(lambda: "interactive") is not None
+
+    release.set()
+    wait_for(job, scheduler)
+    assert all(e["status"] == "no_match" for e in job.entries.values())
+
+
+def test_job_larger_than_its_share_searches_every_video():
+    scheduler = SearchScheduler(max_concurrent=2, max_queued=16, job_share=0.5)
+    ran = []
+
+    def run_one(video_id, stop_event):
+        ran.append(video_id)
+        return "no_match", 0.0, None
+
+    ranked = [(1.0 - i / 100, video(f"v{i}")) for i in range(20)]
+    job = scheduler.submit_job("p", ranked, run_one)
+    wait_for(job, scheduler)
+
+    assert scheduler.max_job_slots == 9
+    assert sorted(ran) == sorted(f"v{i}" for i in range(20))
+    assert all(e["status"] == "no_match" for e in job.entries.values())
+    assert scheduler.stats()["shed"] == 0
+
+
+def test_pending_videos_run_in_priority_order():
+    scheduler = SearchScheduler(max_concurrent=1, max_queued=1, job_share=0.5)
+    order = []
+
+    def run_one(video_id, stop_event):
+        order.append(video_id)
+        return "no_match", 0.0, None
+
+    job = scheduler.submit_job("p", [(0.9, video("v1")), (0.5, video("v2")), (0.1, video("v3"))], run_one)
+    wait_for(job, scheduler)
+    assert order == ["v1", "v2", "v3"]
+
+
+def test_job_rejected_when_nothing_fits():
+    scheduler, release = blocked_scheduler(max_queued=0)
+    with pytest.raises(SchedulerOverloaded):
+        scheduler.submit_job("p", [(0.5, video("v1"))], lambda v, e: ("no_match", 0.0, None))
+    release.set()
+
+
+def test_priority_order_across_jobs():
+    scheduler, release = blocked_scheduler(max_queued=10, job_share=1.0)
+    order = []
+
+    def run_one(video_id, stop_event):
+        order.append(video_id)
+        return "no_match", 0.0, None
+
+    first = scheduler.submit_job("a", [(0.3, video("a1")), (0.1, video("a2"))], run_one)
+    second = scheduler.submit_job("b", [(0.9, video("b1"))], run_one)
+    release.set()
+    wait_for(first)
+    wait_for(second)
+
+    assert order == ["b1", "a1", "a2"]
+
+
+def test_high_confidence_match_stops_job():
+    scheduler, release = blocked_scheduler(max_queued=10, job_share=1.0, high_confidence=0.75)
+    ran = []
+
+    def run_one(video_id, stop_event):
+        ran.append(video_id)
+        if video_id == "v1":
+            return "match_found", 0.9, b"jpg"
+        return "no_match", 0.0, None
+
+    job = scheduler.submit_job("p", [(0.9, video("v1")), (0.5, video("v2")), (0.1, video("v3"))], run_one)
+    release.set()
+    wait_for(job, scheduler)
+
+    result = job.to_dict()
+    assert scheduler.stats()["inflight"] == 0
+    assert ran == ["v1"]
+    assert result["stopped_early"]
+    assert [e["status"] for e in result["videos"]] == ["match_found", "skipped", "skipped"]
+    assert job.images == {"v1": b"jpg"}
+    assert scheduler.stats()["early_stops"] == 1
+
+
+def test_low_confidence_match_does_not_stop_job():
+    scheduler = SearchScheduler(max_concurrent=1, max_queued=10, job_share=1.0, high_confidence=0.75)
+    job = scheduler.submit_job(
+        "p", [(0.9, video("v1")), (0.5, video("v2"))],
+        lambda v, e: ("match_found", 0.6, b"jpg")
+    )
+    wait_for(job)
+    assert not job.stopped_early
+    assert len(job.to_dict()["matches"]) == 2
+
+
+def test_errors_are_recorded_per_video():
+    scheduler = SearchScheduler(max_concurrent=1, max_queued=10, job_share=1.0)
+
+    def run_one(video_id, stop_event):
+        raise RuntimeError("decode failed")
+
+    job = scheduler.submit_job("p", [(0.5, video("v1"))], run_one)
+    wait_for(job, scheduler)
+    assert job.entries["v1"]["status"] == "error"
+    assert job.entries["v1"]["error"] == "decode failed"
+    assert scheduler.stats()["inflight"] == 0
+
+
+def test_high_confidence_match_skips_pending_videos():
+    scheduler = SearchScheduler(max_concurrent=1, max_queued=1, job_share=0.5)
+
+    def run_one(video_id, stop_event):
+        return ("match_found", 0.9, b"jpg") if video_id == "v1" else ("no_match", 0.0, None)
+
+    job = scheduler.submit_job("p", [(0.9, video("v1")), (0.5, video("v2")), (0.1, video("v3"))], run_one)
+    wait_for(job, scheduler)
+
+    assert [e["status"] for e in job.entries.values()] == ["match_found", "skipped", "skipped"]
+    assert job.pending == []
@@ -0,0 +1,64 @@
+import hashlib
+import io
+
+from search_cache import NO_MATCH, SearchResultCache, copy_and_hash, make_key
+
+
+def key(video="v", photo="p", shirt="red", pant="none"):
+    return make_key(video, photo, shirt, pant)
+
+
+def test_miss_then_hit():
+    cache = SearchResultCache(max_entries=2)
+    assert cache.get(key()) is None
+    cache.put(key(), (b"jpg", 0.8))
+    assert cache.get(key()) == (b"jpg", 0.8)
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_no_match_results_are_cached():
+    cache = SearchResultCache()
+    cache.put(key(), (NO_MATCH, 0.0))
+    assert cache.get(key()) == (NO_MATCH, 0.0)
+
+
+def test_evicts_least_recently_used():
+    cache = SearchResultCache(max_entries=2)
+    cache.put(key(video="a"), (b"a", 0.6))
+    cache.put(key(video="b"), (b"b", 0.6))
+    cache.get(key(video="a"))
+    cache.put(key(video="c"), (b"c", 0.6))
+
+    assert cache.get(key(video="b")) is None
+    assert cache.get(key(video="a")) is not None
+    assert cache.get(key(video="c")) is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["entries"] == 2
+
+
+def test_invalidate_video_and_photo():
+    cache = SearchResultCache()
+    cache.put(key(video="a", photo="x"), (b"1", 0.6))
+    cache.put(key(video="a", photo="y"), (b"2", 0.6))
+    cache.put(key(video="b", photo="x"), (b"3", 0.6))
+
+    assert cache.invalidate_video("a") == 2
+    assert cache.get(key(video="b", photo="x")) is not None
+    assert cache.invalidate_photo("x") == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_key_normalises_colors():
+    assert make_key("v", "p", " Red ", "NONE") == make_key("v", "p", "red", "none")
+    assert make_key("v", "p", "red", None) == make_key("v", "p", "red", "none")
+    assert make_key("v", "p", "red", "none", profile="a") != make_key("v", "p", "red", "none", profile="b")
+
+
+def test_copy_and_hash():
+    data = b"x" * 2500
+    dst = io.BytesIO()
+    digest = copy_and_hash(io.BytesIO(data), dst, chunk_size=1024)
+    assert dst.getvalue() == data
+    assert digest == hashlib.sha256(data).hexdigest()